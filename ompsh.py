@@ -1,10 +1,16 @@
 
 import sys
 import os
+import io
+import time
 import micropython
 import gc
 
 HAVE_NET = True
+HAVE_ASYNCIO = True
+HAVE_THREAD = True
+HAVE_DEFLATE = True
+HAVE_TICKS = hasattr(time, 'ticks_ms')
 
 if sys.implementation.name == 'micropython':
     import binascii as ompsh_binascii
@@ -28,10 +34,72 @@ elif sys.implementation.name == 'circuitpython':
         print('network stack not available')
         HAVE_NET = False
 
+try:
+    import asyncio as ompsh_asyncio
+except ImportError:
+    try:
+        import uasyncio as ompsh_asyncio
+    except ImportError:
+        HAVE_ASYNCIO = False
+
+try:
+    import hashlib as ompsh_hashlib
+except ImportError:
+    import uhashlib as ompsh_hashlib
+
+try:
+    import deflate as ompsh_deflate
+except ImportError:
+    HAVE_DEFLATE = False
+
+try:
+    import zlib as ompsh_zlib
+except ImportError:
+    import uzlib as ompsh_zlib
+
+try:
+    import heapq as ompsh_heapq
+except ImportError:
+    import uheapq as ompsh_heapq
+
+try:
+    import _thread as ompsh_thread
+except ImportError:
+    HAVE_THREAD = False
+
 
 __version__ = "0.0.0"
 __repo__ = "https://github.com/ndrogness/ompsh"
 
+HTTP_BUF_SIZE = 1024
+HTTP_MAX_HEADER = 4096
+# Servers may compress with the full 32K window, so inflate has to allow it
+HTTP_INFLATE_WBITS = 15
+# Window used when compressing on the device, 1K keeps the compressor small
+GZIP_WBITS = 10
+HTTPD_PORT = 80
+HTTPD_MAX_CONNS = 2
+HTTPD_BUF_SIZE = 1024
+HTTPD_TIMEOUT = 10
+HTTPD_MAX_HEADERS = 32
+HTTPD_STOP_WAIT_MS = 2000
+HTTPD_CONTENT_TYPES = {
+    'txt': 'text/plain',
+    'log': 'text/plain',
+    'py': 'text/plain',
+    'csv': 'text/plain',
+    'cfg': 'text/plain',
+    'md': 'text/plain',
+    'htm': 'text/html',
+    'html': 'text/html',
+    'json': 'application/json',
+}
+SCHED_TICK_MS = 500
+SCHED_MAX_LINES = 20
+SCHED_RING_LINES = 50
+SYNC_INDEX_FILE = '.ompsh_sync'
+SYNC_TMP_SUFFIX = '.tmp'
+
 
 def net_ioctl(net_info):
     """
@@ -120,9 +188,11 @@ def decode_http_header(hdr_obj):
             http_hdr['Status'] = ' '.join(hstatus[2:])
         else:
             try:
-                hkey, hval = line.split(': ')
+                hkey, hval = line.split(':', 1)
+                hkey = hkey.strip()
+                hval = hval.strip()
                 http_hdr[hkey] = hval
-                if hkey == 'Content-Type':
+                if hkey.lower() == 'content-type':
                     if hval == 'text/plain' or hval == 'text/html' or hval == 'text/html; charset=iso-8859-1':
                         http_hdr['File-Type'] = 'text'
                     else:
@@ -135,6 +205,568 @@ def decode_http_header(hdr_obj):
     return http_hdr
 
 
+class HttpBodyStream(io.IOBase):
+    """
+    Stream over an HTTP body, returning the bytes read along with the header first
+    """
+
+    def __init__(self, sock, prefix):
+        self.prefix = prefix
+        self.sock_readinto = getattr(sock, 'readinto', None) or sock.recv_into
+
+    def readinto(self, buf):
+        if self.prefix:
+            nread = min(len(buf), len(self.prefix))
+            buf[:nread] = self.prefix[:nread]
+            self.prefix = self.prefix[nread:]
+            return nread
+
+        return self.sock_readinto(buf)
+
+
+class ZlibReader(io.IOBase):
+    """
+    Streaming inflate on top of zlib.decompressobj, for when the deflate module isnt available
+    """
+
+    def __init__(self, stream, wbits):
+        self.stream = stream
+        self.zobj = ompsh_zlib.decompressobj(wbits)
+        self.inbuf = bytearray(HTTP_BUF_SIZE)
+        self.pending = b''
+
+    def readinto(self, buf):
+        try:
+            while True:
+                if not self.pending:
+                    if self.zobj.eof:
+                        return 0
+                    nread = self.stream.readinto(self.inbuf)
+                    if not nread:
+                        raise OSError('Truncated compressed stream')
+                    self.pending = memoryview(self.inbuf)[:nread]
+
+                # max_length bounds the output to buf, the rest waits in unconsumed_tail
+                data = self.zobj.decompress(self.pending, len(buf))
+                self.pending = self.zobj.unconsumed_tail
+                if data:
+                    buf[:len(data)] = data
+                    return len(data)
+        except ompsh_zlib.error as e:
+            raise OSError(str(e))
+
+
+class ZlibWriter(io.IOBase):
+    """
+    Streaming gzip compression on top of zlib.compressobj, for when the deflate module isnt available
+    """
+
+    def __init__(self, stream, wbits):
+        self.stream = stream
+        self.zobj = ompsh_zlib.compressobj(9, ompsh_zlib.DEFLATED, wbits + 16)
+
+    def write(self, data):
+        self.stream.write(self.zobj.compress(data))
+        return len(data)
+
+    def close(self):
+        self.stream.write(self.zobj.flush())
+
+
+def inflate_stream(stream, is_gzip, wbits=HTTP_INFLATE_WBITS):
+    """
+    Wraps a stream so reads from it return inflated data
+    :param stream: the compressed stream, must support readinto
+    :param is_gzip: True for gzip framing, False for zlib (HTTP deflate)
+    :param wbits: largest window the compressed data may use
+    :return: stream object supporting readinto
+    """
+
+    if HAVE_DEFLATE:
+        return ompsh_deflate.DeflateIO(stream, ompsh_deflate.GZIP if is_gzip else ompsh_deflate.ZLIB, wbits)
+
+    if hasattr(ompsh_zlib, 'DecompIO'):
+        return ompsh_zlib.DecompIO(stream, wbits + 16 if is_gzip else wbits)
+
+    return ZlibReader(stream, wbits + 16 if is_gzip else wbits)
+
+
+def gzip_stream(stream, wbits=GZIP_WBITS):
+    """
+    Wraps a stream so writes to it are gzip compressed, close() must be called to finish
+    :param stream: the stream to write the compressed data to
+    :param wbits: compression window size
+    :return: stream object supporting write and close, None if compression isnt available
+    """
+
+    if HAVE_DEFLATE:
+        return ompsh_deflate.DeflateIO(stream, ompsh_deflate.GZIP, wbits)
+
+    if hasattr(ompsh_zlib, 'compressobj'):
+        return ZlibWriter(stream, wbits)
+
+    return None
+
+
+def http_header_get(http_hdr, hname, hdefault=None):
+    """
+    Looks up a header from decode_http_header, header names being case insensitive
+    :param http_hdr: dictionary of the HTTP Header Key-value pairs
+    :param hname: the header name
+    :param hdefault: value returned when the header is missing
+    :return: the header value
+    """
+
+    hname = hname.lower()
+    for hkey, hval in http_hdr.items():
+        if hkey.lower() == hname:
+            return hval
+
+    return hdefault
+
+
+def http_get(url, http_file, hasher=None):
+    """
+    Retrieves a url over HTTP/1.0, streaming the body to a file. gzip and deflate
+    encoded bodies are requested and inflated as they are received
+    :param url: http://host[:port]/path
+    :param http_file: file to write the body to, only created on a 200 response
+    :param hasher: optional hashlib object updated with the decoded body as it is written
+    :return: (True if retrieved, dict of the HTTP header)
+    """
+
+    http_toks = url.split('/', 3)
+    if len(http_toks) < 3 or http_toks[0] != 'http:' or http_toks[1] != '' or http_toks[2] == '':
+        return False, {'Error': 'Invalid url: {0}'.format(url)}
+
+    http_host = http_toks[2]
+    http_path = http_toks[3] if len(http_toks) > 3 else ''
+    http_port = 80
+    if ':' in http_host:
+        http_host, http_port = http_host.split(':', 1)
+        try:
+            http_port = int(http_port)
+        except ValueError:
+            http_port = 0
+        if not 0 < http_port < 65536 or http_host == '':
+            return False, {'Error': 'Invalid url: {0}'.format(url)}
+
+    http_req = 'GET /{0} HTTP/1.0\r\nHost: {1}\r\nAccept-Encoding: gzip, deflate\r\n\r\n'.format(http_path,
+                                                                                             http_host)
+    header = b''
+    http_hdr = {}
+    http_valid = False
+    http_s = None
+    f = None
+
+    try:
+        http_addr = ompsh_socket.getaddrinfo(http_host, http_port)[0][-1]
+        http_s = ompsh_socket.socket()
+        http_s.connect(http_addr)
+        http_s.send(bytes(http_req, 'utf8'))
+
+        # Headers can span several reads, keep going until the blank line
+        while b'\r\n\r\n' not in header:
+            buff_data = http_s.recv(HTTP_BUF_SIZE)
+            if not buff_data or len(header) > HTTP_MAX_HEADER:
+                return False, http_hdr
+            header += buff_data
+
+        header, buff_data = header.split(b'\r\n\r\n', 1)
+        http_hdr = decode_http_header(header)
+        if http_hdr.get('Code') != '200':
+            return False, http_hdr
+
+        http_stream = HttpBodyStream(http_s, buff_data)
+        http_encoding = http_header_get(http_hdr, 'Content-Encoding', 'identity').lower()
+        if http_encoding == 'gzip' or http_encoding == 'deflate':
+            http_stream = inflate_stream(http_stream, http_encoding == 'gzip')
+
+        buf = bytearray(HTTP_BUF_SIZE)
+        mv = memoryview(buf)
+        f = open(http_file, 'wb')
+        while True:
+            nread = http_stream.readinto(buf)
+            if not nread:
+                break
+            if hasher is not None:
+                hasher.update(mv[:nread])
+            f.write(mv[:nread])
+
+        http_valid = True
+
+    except OSError as e:
+        http_hdr['Error'] = str(e)
+
+    finally:
+        if f is not None:
+            f.close()
+        if http_s is not None:
+            http_s.close()
+
+    return http_valid, http_hdr
+
+
+def hash_file(hash_path, buf):
+    """
+    Computes the sha256 of a file
+    :param hash_path: the file to hash
+    :param buf: bytearray to read the file through
+    :return: hex digest string
+    """
+
+    h = ompsh_hashlib.sha256()
+    mv = memoryview(buf)
+    with open(hash_path, 'rb') as f:
+        while True:
+            nread = f.readinto(buf)
+            if not nread:
+                break
+            h.update(mv[:nread])
+
+    return ompsh_binascii.hexlify(h.digest()).decode()
+
+
+def url_unquote(url_str):
+    """
+    Decodes %XX escapes in a url path
+    :param url_str: the url encoded string
+    :return: the decoded string
+    """
+
+    if '%' not in url_str:
+        return url_str
+
+    url_bytes = bytearray()
+    i = 0
+    ulen = len(url_str)
+    while i < ulen:
+        c = url_str[i]
+        if c == '%' and i + 2 < ulen:
+            try:
+                url_bytes.append(int(url_str[i + 1:i + 3], 16))
+                i += 3
+                continue
+            except ValueError:
+                pass
+        url_bytes.extend(c.encode())
+        i += 1
+
+    return url_bytes.decode()
+
+
+def url_quote(url_str):
+    """
+    Encodes the characters of a url path that need escaping
+    :param url_str: the plain string
+    :return: the url encoded string
+    """
+
+    quoted = []
+    for b in url_str.encode():
+        c = chr(b)
+        if b < 128 and (c.isalpha() or c.isdigit() or c in '/-_.~'):
+            quoted.append(c)
+        else:
+            quoted.append('%{:02X}'.format(b))
+
+    return ''.join(quoted)
+
+
+def html_escape(html_str):
+    """
+    Escapes the characters that would be read as HTML markup
+    :param html_str: the plain string
+    :return: the escaped string
+    """
+
+    return html_str.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def parse_http_range(range_hdr, size):
+    """
+    Parses a single range HTTP Range header
+    :param range_hdr: the Range header value, e.g. bytes=100-199
+    :param size: the size of the resource
+    :return: (start, end) inclusive, None if the header should be ignored.
+             start >= size means the range is unsatisfiable
+    """
+
+    if not range_hdr.startswith('bytes=') or ',' in range_hdr:
+        return None
+
+    try:
+        rstart, rend = range_hdr[6:].strip().split('-')
+        if rstart == '':
+            # Suffix range, the last N bytes, a zero length suffix can't be satisfied
+            suffix = int(rend)
+            start = max(0, size - suffix) if suffix > 0 else size
+            end = size - 1
+        else:
+            start = int(rstart)
+            end = size - 1 if rend == '' else min(int(rend), size - 1)
+            if end < start < size:
+                return None
+    except ValueError:
+        return None
+
+    return start, end
+
+
+def ilistdir_compat(path):
+    """
+    Iterates a directory without building a list of names
+    :param path: the directory
+    :return: iterator of (name, type) tuples, type 0x4000 for dirs and 0x8000 for files
+    """
+
+    try:
+        return os.ilistdir(path)
+    except AttributeError:
+        # Not running on micropython
+        return ((x.name, 0x4000 if x.is_dir() else 0x8000) for x in os.scandir(path))
+
+
+def ticks_ms():
+    """
+    Millisecond tick counter, may wrap so compare ticks with ticks_diff
+    :return: current tick count in ms
+    """
+
+    if HAVE_TICKS:
+        return time.ticks_ms()
+    return int(time.monotonic() * 1000)
+
+
+def ticks_diff(new_ticks, old_ticks):
+    """
+    Difference between two ticks_ms values, handling wraparound
+    :return: new_ticks - old_ticks in ms
+    """
+
+    if HAVE_TICKS:
+        return time.ticks_diff(new_ticks, old_ticks)
+    return new_ticks - old_ticks
+
+
+def sleep_ms(ms):
+    if HAVE_TICKS:
+        time.sleep_ms(ms)
+    else:
+        time.sleep(ms / 1000.0)
+
+
+def quote_arg(arg):
+    """
+    Quotes an argument so split_cmdline gives it back unchanged
+    :param arg: the argument
+    :return: the argument, single quoted if needed
+    """
+
+    for c in arg:
+        if c in ' \t\'"\\*?':
+            return "'" + arg.replace("'", "'\\''") + "'"
+
+    return arg if arg != '' else "''"
+
+
+GLOB_STAR = 0
+GLOB_ONE = 1
+
+
+def split_cmdline(scmd):
+    """
+    Splits a command line into words, honouring single/double quotes and backslash escapes
+    :param scmd: the command line string
+    :return: list of (word, pattern) tuples, pattern is None unless the word has unquoted wildcards
+    """
+
+    words = []
+    word = []
+    pattern = []
+    in_word = False
+    has_glob = False
+    quote = ''
+    i = 0
+    slen = len(scmd)
+
+    while i < slen:
+        c = scmd[i]
+        if quote:
+            if c == quote:
+                quote = ''
+            else:
+                if c == '\\' and quote == '"' and i + 1 < slen and scmd[i + 1] in '"\\':
+                    i += 1
+                    c = scmd[i]
+                word.append(c)
+                pattern.append('\\' + c if c in '*?\\' else c)
+
+        elif c == '\\':
+            if i + 1 < slen:
+                i += 1
+                c = scmd[i]
+            word.append(c)
+            pattern.append('\\' + c if c in '*?\\' else c)
+            in_word = True
+
+        elif c == '"' or c == "'":
+            quote = c
+            in_word = True
+
+        elif c == ' ' or c == '\t':
+            if in_word:
+                words.append((''.join(word), ''.join(pattern) if has_glob else None))
+                word = []
+                pattern = []
+                in_word = False
+                has_glob = False
+
+        else:
+            if c == '*' or c == '?':
+                has_glob = True
+            word.append(c)
+            pattern.append(c)
+            in_word = True
+
+        i += 1
+
+    if quote:
+        raise ValueError('Unterminated quote: {0}'.format(quote))
+
+    if in_word:
+        words.append((''.join(word), ''.join(pattern) if has_glob else None))
+
+    return words
+
+
+def glob_compile(pattern):
+    """
+    Compiles a wildcard pattern (* and ?, backslash escapes) for use by glob_match
+    :param pattern: the wildcard pattern
+    :return: list of tokens, GLOB_STAR, GLOB_ONE or a literal character
+    """
+
+    gpat = []
+    i = 0
+    plen = len(pattern)
+    while i < plen:
+        c = pattern[i]
+        if c == '\\' and i + 1 < plen:
+            i += 1
+            gpat.append(pattern[i])
+        elif c == '*':
+            # Consecutive stars match the same as a single one
+            if len(gpat) == 0 or gpat[-1] != GLOB_STAR:
+                gpat.append(GLOB_STAR)
+        elif c == '?':
+            gpat.append(GLOB_ONE)
+        else:
+            gpat.append(c)
+        i += 1
+
+    return gpat
+
+
+def glob_unescape(pattern):
+    """
+    Strips the backslash escapes added by split_cmdline, leaving wildcards as literals
+    :param pattern: the wildcard pattern
+    :return: the literal string
+    """
+
+    lit = []
+    i = 0
+    plen = len(pattern)
+    while i < plen:
+        if pattern[i] == '\\' and i + 1 < plen:
+            i += 1
+        lit.append(pattern[i])
+        i += 1
+
+    return ''.join(lit)
+
+
+def glob_match(gpat, name):
+    """
+    Matches a name against a compiled wildcard pattern without recursion
+    :param gpat: pattern compiled by glob_compile
+    :param name: the name to test
+    :return: True if name matches, False otherwise
+    """
+
+    pi = 0
+    ni = 0
+    star_pi = -1
+    star_ni = 0
+    plen = len(gpat)
+    nlen = len(name)
+
+    while ni < nlen:
+        if pi < plen:
+            tok = gpat[pi]
+            if tok == GLOB_STAR:
+                star_pi = pi
+                star_ni = ni
+                pi += 1
+                continue
+            if tok == GLOB_ONE or tok == name[ni]:
+                pi += 1
+                ni += 1
+                continue
+
+        if star_pi < 0:
+            return False
+
+        # Let the last star swallow one more character and retry
+        star_ni += 1
+        ni = star_ni
+        pi = star_pi + 1
+
+    while pi < plen and gpat[pi] == GLOB_STAR:
+        pi += 1
+
+    return pi == plen
+
+
+def expand_glob(pattern, dir_cache):
+    """
+    Expands a wildcard pattern against the filesystem. Wildcards are only honoured in
+    the last path component, and each directory is listed at most once per dir_cache
+    :param pattern: the wildcard pattern, as returned by split_cmdline
+    :param dir_cache: dict of directory -> list of entries, filled in as directories are listed
+    :return: sorted list of matching paths, empty if nothing matched
+    """
+
+    slash = pattern.rfind('/')
+    if slash < 0:
+        prefix = ''
+        base = pattern
+    else:
+        prefix = glob_unescape(pattern[:slash + 1])
+        base = pattern[slash + 1:]
+
+    gdir = prefix.rstrip('/') or ('/' if prefix else '.')
+
+    if gdir not in dir_cache:
+        try:
+            dir_cache[gdir] = os.listdir(gdir)
+        except OSError:
+            dir_cache[gdir] = []
+
+    gpat = glob_compile(base)
+    show_hidden = len(gpat) > 0 and gpat[0] == '.'
+    matches = []
+    for gname in dir_cache[gdir]:
+        if gname.startswith('.') and not show_hidden:
+            continue
+        if glob_match(gpat, gname):
+            matches.append(prefix + gname)
+
+    matches.sort()
+    return matches
+
+
 class MprShellCmd:
 
     ALL_CMDS = []
@@ -148,6 +780,27 @@ class MprShellCmd:
         self.input_echo = True
         self.output = []
         self.flags = {'error': ''}
+        # getopt style flag spec, e.g. 'la' or 'n:' for a flag taking a value
+        self.flag_spec = ''
+        self.flag_table = None
+        # Stop parsing flags at the first plain arg, for commands that take another command line
+        self.flags_before_args = False
+
+    def compile_flags(self):
+        """
+        Compiles self.flag_spec into a lookup table of flag -> takes a value
+        :return: the compiled flag table
+        """
+
+        self.flag_table = {}
+        i = 0
+        while i < len(self.flag_spec):
+            cf = self.flag_spec[i]
+            takes_value = i + 1 < len(self.flag_spec) and self.flag_spec[i + 1] == ':'
+            self.flag_table[cf] = takes_value
+            i += 2 if takes_value else 1
+
+        return self.flag_table
 
     def stat_file(self, filename):
 
@@ -186,19 +839,61 @@ class MprShellCmd:
         return fstat
 
     def find_flags(self, cflags, cargs):
-        for carg in cargs:
-            if carg.startswith('-'):
-                _, cf = carg.split('-')
-                if cf in cflags:
+        """
+        Parses flags out of cargs using the compiled flag spec. Combined flags (-la),
+        flag values (-n 5 or -n5) and -- to end flag parsing are supported
+        :param cflags: dict to store flags in, reset to defaults first
+        :param cargs: list of args, left holding only the non-flag args
+        :return: True if flags were valid, False otherwise (error in self.flags['error'])
+        """
+
+        if self.flag_table is None:
+            self.compile_flags()
+
+        for cf, takes_value in self.flag_table.items():
+            cflags[cf] = None if takes_value else False
+
+        cargs_left = []
+        i = 0
+        while i < len(cargs):
+            carg = cargs[i]
+            i += 1
+
+            if carg == '--':
+                cargs_left.extend(cargs[i:])
+                break
+
+            if len(carg) < 2 or not carg.startswith('-'):
+                cargs_left.append(carg)
+                if self.flags_before_args:
+                    cargs_left.extend(cargs[i:])
+                    break
+                continue
+
+            j = 1
+            while j < len(carg):
+                cf = carg[j]
+                j += 1
+                if cf not in self.flag_table:
+                    self.flags['error'] = 'Invalid flag: {0}'.format(cf)
+                    return False
+
+                if not self.flag_table[cf]:
                     cflags[cf] = True
+                    continue
+
+                if j < len(carg):
+                    cflags[cf] = carg[j:]
+                elif i < len(cargs):
+                    cflags[cf] = cargs[i]
+                    i += 1
                 else:
-                    # print('Invalid flag:', cf)
-                    # self.output.append('Invalid flag: {0}'.format(cf))
-                    self.flags['error'] = 'Invalid flag: {0}'.format(cf)
+                    self.flags['error'] = 'Flag requires a value: {0}'.format(cf)
                     return False
-                cargs.remove(carg)
+                break
 
-        # print('Cflags:', cflags, 'Cargs:',cargs)
+        cargs.clear()
+        cargs.extend(cargs_left)
         return True
 
     def cmd_run(self):
@@ -221,52 +916,7 @@ class CmdWGET(MprShellCmd):
         self.ALL_CMDS.append(self.name)
 
     def _do_wget(self, url, wget_file):
-
-        _, _, wget_host, wget_path = url.split('/', 3)
-        wget_url = 'GET /{0} HTTP/1.0\r\nHost: {1}\r\n\r\n'.format(wget_path, wget_host)
-        wget_addr = ompsh_socket.getaddrinfo(wget_host, 80)[0][-1]
-        wget_s = ompsh_socket.socket()
-        wget_s.connect(wget_addr)
-        wget_s.send(bytes(wget_url, 'utf8'))
-        d_data = b''
-        header = ''
-        wget_valid = False
-        wget_hdr = {}
-
-        while True:
-            buff_data = wget_s.recv(1000)
-            if buff_data:
-                if header == '':
-                    header, d_data = buff_data.split(b'\r\n\r\n')
-                    wget_hdr = decode_http_header(header)
-                    if wget_hdr['Status'] == 'OK' and wget_hdr['Code'] == '200':
-                        if wget_hdr['File-Type'] == 'text':
-                            f = open(wget_file, 'w')
-                        else:
-                            f = open(wget_file, 'wb')
-                        wget_valid = True
-
-                    else:
-                        break
-
-                else:
-                    d_data = buff_data
-
-                if wget_hdr['File-Type'] == 'text':
-                    url_data = d_data.decode()
-                else:
-                    url_data = d_data
-
-                if wget_valid:
-                    f.write(url_data)
-
-            else:
-                if wget_valid:
-                    f.close()
-                break
-
-        wget_s.close()
-        return wget_valid, wget_hdr
+        return http_get(url, wget_file)
 
     def cmd_run(self, cargs=None):
         if len(cargs) == 0:
@@ -295,6 +945,546 @@ class CmdWGET(MprShellCmd):
         return wget_retval
 
 
+class CmdGZIP(MprShellCmd):
+
+    def __init__(self, cmd_username, decompress=False):
+        super().__init__()
+        self.name = 'gunzip' if decompress else 'gzip'
+        self.help = 'decompresses .gz files' if decompress else 'compresses files to .gz'
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.flag_spec = 'dk'
+        self.decompress = decompress
+        self.buf = bytearray(HTTP_BUF_SIZE)
+
+    def _copy(self, src, dst):
+        mv = memoryview(self.buf)
+        while True:
+            nread = src.readinto(self.buf)
+            if not nread:
+                break
+            dst.write(mv[:nread])
+
+    def _gzip_file(self, src_path, decompress):
+        if decompress:
+            if not src_path.endswith('.gz'):
+                self.output.append('Unknown suffix, ignored: {0}'.format(src_path))
+                return False
+            dst_path = src_path[:-3]
+        else:
+            dst_path = src_path + '.gz'
+
+        file_info = self.stat_file(src_path)
+        if not file_info['is_file']:
+            self.output.append(file_info['error'] if not file_info['exists'] else 'Not a file: {0}'.format(src_path))
+            return False
+
+        if self.stat_file(dst_path)['exists']:
+            self.output.append('Already exists: {0}'.format(dst_path))
+            return False
+
+        try:
+            with open(src_path, 'rb') as fi, open(dst_path, 'wb') as fo:
+                if decompress:
+                    self._copy(inflate_stream(fi, True), fo)
+                else:
+                    zw = gzip_stream(fo)
+                    if zw is None:
+                        raise OSError('compression not supported')
+                    self._copy(fi, zw)
+                    zw.close()
+        except OSError as e:
+            if self.stat_file(dst_path)['exists']:
+                os.remove(dst_path)
+            self.output.append('Couldnt {0} {1}: {2}'.format('gunzip' if decompress else 'gzip', src_path, e))
+            return False
+
+        if not self.flags['k']:
+            os.remove(src_path)
+
+        return True
+
+    def cmd_run(self, cargs=None):
+        if not self.find_flags(self.flags, cargs):
+            self.output.append(self.flags['error'])
+            return False
+
+        if len(cargs) == 0:
+            self.output.append('Please specify a file')
+            return False
+
+        gz_retval = True
+        for gz_path in cargs:
+            if not self._gzip_file(gz_path, self.decompress or self.flags['d']):
+                gz_retval = False
+
+        return gz_retval
+
+
+class CmdSYNC(MprShellCmd):
+
+    def __init__(self, cmd_username):
+        super().__init__()
+        self.name = 'sync'
+        self.help = 'downloads changed files listed in a manifest: sync [-n] [-d dir] URL/manifest'
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.flag_spec = 'nd:'
+        self.buf = bytearray(HTTP_BUF_SIZE)
+
+    def _load_index(self, index_path):
+        # Each line is: sha256 size mtime path
+        sync_index = {}
+        try:
+            with open(index_path, 'r') as f:
+                for line in f:
+                    itoks = line.rstrip('\n').split(' ', 3)
+                    if len(itoks) == 4:
+                        sync_index[itoks[3]] = [itoks[0], int(itoks[1]), int(itoks[2])]
+        except (OSError, ValueError):
+            pass
+
+        return sync_index
+
+    def _save_index(self, index_path, sync_index):
+        with open(index_path + SYNC_TMP_SUFFIX, 'w') as f:
+            for ipath, ival in sync_index.items():
+                f.write('{0} {1} {2} {3}\n'.format(ival[0], ival[1], ival[2], ipath))
+        self._replace(index_path + SYNC_TMP_SUFFIX, index_path)
+
+    def _replace(self, src, dst):
+        try:
+            os.rename(src, dst)
+        except OSError:
+            # Some filesystems (FAT) wont rename over an existing file
+            os.remove(dst)
+            os.rename(src, dst)
+
+    def _local_hash(self, lpath, sync_index, ipath):
+        """
+        Returns the cached hash of a local file, rehashing only if its size or mtime changed
+        :return: (hex digest, size), (None, -1) if the file doesnt exist
+        """
+
+        try:
+            lstat = os.stat(lpath)
+        except OSError:
+            sync_index.pop(ipath, None)
+            return None, -1
+
+        cached = sync_index.get(ipath)
+        if cached is not None and cached[1] == lstat[6] and cached[2] == lstat[8]:
+            return cached[0], lstat[6]
+
+        lhash = hash_file(lpath, self.buf)
+        sync_index[ipath] = [lhash, lstat[6], lstat[8]]
+        return lhash, lstat[6]
+
+    def _makedirs(self, spath):
+        sdir = '/' if spath.startswith('/') else ''
+        for stok in spath.split('/')[:-1]:
+            if stok == '':
+                continue
+            sdir += stok
+            if not self.stat_file(sdir)['exists']:
+                try:
+                    os.mkdir(sdir)
+                except OSError:
+                    self.output.append('Couldnt make directory: {0}'.format(sdir))
+                    return False
+            sdir += '/'
+
+        return True
+
+    def _http_error(self, sync_hdr):
+        if 'Error' in sync_hdr:
+            return sync_hdr['Error']
+        return '{0} {1}'.format(sync_hdr.get('Code', ''), sync_hdr.get('Status', ''))
+
+    def _fetch(self, url, lpath, msize, mhash):
+        tmp_path = lpath + SYNC_TMP_SUFFIX
+        h = ompsh_hashlib.sha256()
+        try:
+            sync_retval, sync_hdr = http_get(url, tmp_path, h)
+        except OSError as e:
+            sync_retval = False
+            sync_hdr = {'Error': str(e)}
+
+        if sync_retval:
+            if self.stat_file(tmp_path)['st_size'] != msize:
+                self.output.append('Size mismatch: {0}'.format(lpath))
+                sync_retval = False
+            elif ompsh_binascii.hexlify(h.digest()).decode() != mhash:
+                self.output.append('Hash mismatch: {0}'.format(lpath))
+                sync_retval = False
+        else:
+            self.output.append('Couldnt retrieve {0}: {1}'.format(lpath, self._http_error(sync_hdr)))
+
+        if sync_retval:
+            self._replace(tmp_path, lpath)
+        elif self.stat_file(tmp_path)['exists']:
+            os.remove(tmp_path)
+
+        return sync_retval
+
+    def cmd_run(self, cargs=None):
+        if not self.find_flags(self.flags, cargs):
+            self.output.append(self.flags['error'])
+            return False
+
+        if len(cargs) == 0:
+            self.output.append('Please specify a manifest url')
+            return False
+
+        if HAVE_NET is False:
+            self.output.append('Networking stack not functional or disabled')
+            return False
+
+        if not net_ioctl(None):
+            self.output.append('Not Connected')
+            return False
+
+        url_base = cargs[0].rsplit('/', 1)[0] + '/'
+        sync_dir = '' if self.flags['d'] is None else self.flags['d'].rstrip('/') + '/'
+        index_path = sync_dir + SYNC_INDEX_FILE
+        manifest_path = index_path + '.manifest'
+
+        if sync_dir != '' and not self._makedirs(sync_dir):
+            return False
+
+        if sync_dir != '' and not self.stat_file(sync_dir)['is_dir']:
+            self.output.append('Not a directory: {0}'.format(sync_dir))
+            return False
+
+        try:
+            sync_retval, sync_hdr = http_get(cargs[0], manifest_path)
+        except OSError as e:
+            sync_retval = False
+            sync_hdr = {'Error': str(e)}
+
+        if not sync_retval:
+            self.output.append('Couldnt retrieve manifest: {0}'.format(self._http_error(sync_hdr)))
+            return False
+
+        sync_index = self._load_index(index_path)
+        total = 0
+        changed = 0
+        failed = 0
+        bytes_fetched = 0
+
+        # Manifest lines are: sha256 size path, relative to the manifest url
+        with open(manifest_path, 'r') as mf:
+            for line in mf:
+                mtoks = line.strip().split(' ', 2)
+                if len(mtoks) < 3 or mtoks[0].startswith('#'):
+                    continue
+
+                mhash = mtoks[0].lower()
+                mpath = mtoks[2]
+                try:
+                    msize = int(mtoks[1])
+                except ValueError:
+                    self.output.append('Bad manifest line: {0}'.format(line.strip()))
+                    failed += 1
+                    continue
+
+                if mpath.startswith('/') or '..' in mpath.split('/'):
+                    self.output.append('Refusing path: {0}'.format(mpath))
+                    failed += 1
+                    continue
+
+                total += 1
+                lpath = sync_dir + mpath
+                lhash, lsize = self._local_hash(lpath, sync_index, mpath)
+                if lsize == msize and lhash == mhash:
+                    continue
+
+                changed += 1
+                if self.flags['n']:
+                    self.output.append('Would fetch: {0}'.format(mpath))
+                    continue
+
+                if not self._makedirs(lpath):
+                    failed += 1
+                    continue
+
+                if self._fetch(url_base + url_quote(mpath), lpath, msize, mhash):
+                    lstat = os.stat(lpath)
+                    sync_index[mpath] = [mhash, lstat[6], lstat[8]]
+                    bytes_fetched += msize
+                    self.output.append('Fetched: {0}'.format(mpath))
+                else:
+                    failed += 1
+
+                gc.collect()
+
+        os.remove(manifest_path)
+        self._save_index(index_path, sync_index)
+        self.output.append('{0} files, {1} changed, {2} failed, {3} bytes fetched'.format(total, changed, failed,
+                                                                                          bytes_fetched))
+        return failed == 0
+
+
+class MprHttpd:
+
+    def __init__(self, root='/', port=HTTPD_PORT, max_conns=HTTPD_MAX_CONNS, buf_size=HTTPD_BUF_SIZE):
+        self.root = root
+        self.port = port
+        self.max_conns = max_conns
+        self.running = False
+        # True until serve_forever has returned and the listening socket is closed
+        self.active = False
+        self.error = ''
+        self.requests = 0
+        self.bytes_sent = 0
+        # One buffer per connection slot, allocated once, an empty pool means we are at the cap
+        self.buf_pool = [bytearray(buf_size) for _ in range(max_conns)]
+
+    def serve_forever(self):
+        try:
+            ompsh_asyncio.run(self._serve())
+        except (OSError, OverflowError, ValueError) as e:
+            self.error = 'httpd failed: {0}'.format(e)
+        finally:
+            self.running = False
+            self.active = False
+
+    async def _serve(self):
+        server = await ompsh_asyncio.start_server(self._handle, '0.0.0.0', self.port)
+        while self.running:
+            await ompsh_asyncio.sleep(1)
+
+        server.close()
+        await server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        if len(self.buf_pool) == 0:
+            self._start_response(writer, 503, 'Service Unavailable', 'text/plain', None)
+        else:
+            buf = self.buf_pool.pop()
+            try:
+                await self._handle_request(reader, writer, buf)
+            except (OSError, ompsh_asyncio.TimeoutError, UnicodeError):
+                pass
+            finally:
+                self.buf_pool.append(buf)
+
+        try:
+            await self._drain(writer)
+            writer.close()
+            await writer.wait_closed()
+        except (OSError, ompsh_asyncio.TimeoutError):
+            pass
+
+    async def _drain(self, writer):
+        # A client that stops reading must not hold on to a connection slot forever
+        await ompsh_asyncio.wait_for(writer.drain(), HTTPD_TIMEOUT)
+
+    def _start_response(self, writer, code, reason, ctype, clen, extra_hdrs=''):
+        hdr = 'HTTP/1.0 {0} {1}\r\nServer: ompsh/{2}\r\nConnection: close\r\nAccept-Ranges: bytes\r\n'.format(
+            code, reason, __version__)
+        hdr += 'Content-Type: {0}\r\n'.format(ctype)
+        if clen is not None:
+            hdr += 'Content-Length: {0}\r\n'.format(clen)
+        writer.write((hdr + extra_hdrs + '\r\n').encode())
+
+    async def _handle_request(self, reader, writer, buf):
+        req_line = await ompsh_asyncio.wait_for(reader.readline(), HTTPD_TIMEOUT)
+        try:
+            req_toks = req_line.decode().split()
+        except UnicodeError:
+            req_toks = []
+        req_hdrs = {}
+        for _ in range(HTTPD_MAX_HEADERS):
+            line = await ompsh_asyncio.wait_for(reader.readline(), HTTPD_TIMEOUT)
+            if line == b'\r\n' or line == b'\n' or line == b'':
+                break
+            try:
+                hkey, hval = line.decode().split(':', 1)
+                req_hdrs[hkey.strip().lower()] = hval.strip()
+            except ValueError:
+                continue
+
+        self.requests += 1
+
+        if len(req_toks) < 2:
+            self._start_response(writer, 400, 'Bad Request', 'text/plain', 0)
+            return
+
+        if req_toks[0] != 'GET' and req_toks[0] != 'HEAD':
+            self._start_response(writer, 405, 'Method Not Allowed', 'text/plain', 0)
+            return
+
+        try:
+            url_path = url_unquote(req_toks[1].split('?', 1)[0])
+        except UnicodeError:
+            self._start_response(writer, 400, 'Bad Request', 'text/plain', 0)
+            return
+
+        url_parts = [x for x in url_path.split('/') if x != '' and x != '.']
+        if '..' in url_parts:
+            self._start_response(writer, 403, 'Forbidden', 'text/plain', 0)
+            return
+
+        fpath = '/'.join([self.root.rstrip('/')] + url_parts) or '/'
+        try:
+            fstat = os.stat(fpath)
+        except OSError:
+            self._start_response(writer, 404, 'Not Found', 'text/plain', 0)
+            return
+
+        if fstat[0] & 0x4000:
+            await self._send_dir(writer, fpath, url_parts, req_toks[0] == 'HEAD')
+        else:
+            await self._send_file(writer, fpath, fstat[6], req_hdrs.get('range'), req_toks[0] == 'HEAD', buf)
+
+    async def _send_dir(self, writer, fpath, url_parts, head_only):
+        self._start_response(writer, 200, 'OK', 'text/html', None)
+        if head_only:
+            return
+
+        url_dir = '/' + '/'.join(url_parts)
+        writer.write('<html><body><h1>{0}</h1><ul>\n'.format(html_escape(url_dir)).encode())
+        if len(url_parts) > 0:
+            writer.write('<li><a href="{0}">..</a></li>\n'.format(url_quote('/' + '/'.join(url_parts[:-1]))).encode())
+
+        for entry in ilistdir_compat(fpath):
+            ename = entry[0]
+            if entry[1] & 0x4000:
+                ename += '/'
+            ehref = url_quote(url_dir.rstrip('/') + '/' + ename)
+            writer.write('<li><a href="{0}">{1}</a></li>\n'.format(ehref, html_escape(ename)).encode())
+            await self._drain(writer)
+
+        writer.write(b'</ul></body></html>\n')
+
+    async def _send_file(self, writer, fpath, fsize, range_hdr, head_only, buf):
+        ctype = HTTPD_CONTENT_TYPES.get(fpath.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+        start = 0
+        end = fsize - 1
+        frange = None if range_hdr is None else parse_http_range(range_hdr, fsize)
+
+        if frange is None:
+            self._start_response(writer, 200, 'OK', ctype, fsize)
+        elif frange[0] >= fsize:
+            self._start_response(writer, 416, 'Range Not Satisfiable', 'text/plain', 0,
+                                 'Content-Range: bytes */{0}\r\n'.format(fsize))
+            return
+        else:
+            start, end = frange
+            self._start_response(writer, 206, 'Partial Content', ctype, end - start + 1,
+                                 'Content-Range: bytes {0}-{1}/{2}\r\n'.format(start, end, fsize))
+
+        if head_only:
+            return
+
+        mv = memoryview(buf)
+        remaining = end - start + 1
+        with open(fpath, 'rb') as f:
+            if start > 0:
+                f.seek(start)
+            while remaining > 0:
+                nread = f.readinto(mv[:min(remaining, len(buf))])
+                if not nread:
+                    break
+                # write() copies into the stream's own buffer, so buf can be refilled straight away
+                writer.write(mv[:nread])
+                await self._drain(writer)
+                remaining -= nread
+                self.bytes_sent += nread
+
+
+class CmdHTTPD(MprShellCmd):
+
+    def __init__(self, cmd_username):
+        super().__init__()
+        self.name = 'httpd'
+        self.help = 'serves files over http: httpd [start|stop|status] [-p port] [-c max_conns] [-d root]'
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.flag_spec = 'p:c:d:'
+        self.httpd = None
+
+    def _start(self):
+        if HAVE_NET is False or HAVE_ASYNCIO is False or HAVE_THREAD is False:
+            self.output.append('httpd needs networking, asyncio and _thread')
+            return False
+
+        if self.httpd is not None and self.httpd.running:
+            self.output.append('httpd already running on port {0}'.format(self.httpd.port))
+            return False
+
+        # A stopped server can hold its port for up to a second, wait for it to let go
+        waited_ms = 0
+        while self.httpd is not None and self.httpd.active and waited_ms < HTTPD_STOP_WAIT_MS:
+            sleep_ms(50)
+            waited_ms += 50
+
+        if self.httpd is not None and self.httpd.active:
+            self.output.append('httpd still stopping, try again')
+            return False
+
+        try:
+            hport = HTTPD_PORT if self.flags['p'] is None else int(self.flags['p'])
+            hconns = HTTPD_MAX_CONNS if self.flags['c'] is None else int(self.flags['c'])
+        except ValueError:
+            self.output.append('Invalid number: {0} {1}'.format(self.flags['p'], self.flags['c']))
+            return False
+
+        if not 0 < hport < 65536:
+            self.output.append('Invalid port: {0}'.format(hport))
+            return False
+
+        # Requests are resolved against the root later, so it mustnt depend on the cwd at that point
+        hroot = os.getcwd() if self.flags['d'] is None else self.flags['d']
+        if not hroot.startswith('/'):
+            hroot = os.getcwd().rstrip('/') + '/' + hroot
+        file_info = self.stat_file(hroot)
+        if not file_info['is_dir']:
+            self.output.append('Not a directory: {0}'.format(hroot))
+            return False
+
+        self.httpd = MprHttpd(root=hroot, port=hport, max_conns=max(1, hconns))
+        # Mark as running before the thread starts, so a quick stop isn't lost
+        self.httpd.running = True
+        self.httpd.active = True
+        ompsh_thread.start_new_thread(self.httpd.serve_forever, ())
+        self.output.append('httpd serving {0} on port {1}'.format(hroot, hport))
+        return True
+
+    def cmd_run(self, cargs=None):
+        if not self.find_flags(self.flags, cargs):
+            self.output.append(self.flags['error'])
+            return False
+
+        hcmd = 'status' if len(cargs) == 0 else cargs[0]
+
+        if hcmd == 'start':
+            return self._start()
+
+        elif hcmd == 'stop':
+            if self.httpd is None or not self.httpd.running:
+                self.output.append('httpd not running')
+                return False
+            self.httpd.running = False
+            self.output.append('httpd stopping')
+            return True
+
+        elif hcmd == 'status':
+            if self.httpd is None:
+                self.output.append('httpd not running')
+                return True
+            if self.httpd.error:
+                self.output.append(self.httpd.error)
+            self.output.append('running={0} port={1} root={2} requests={3} bytes_sent={4} free_slots={5}'.format(
+                self.httpd.running, self.httpd.port, self.httpd.root, self.httpd.requests,
+                self.httpd.bytes_sent, len(self.httpd.buf_pool)))
+            return True
+
+        self.output.append('Unknown httpd command: {0}'.format(hcmd))
+        return False
+
+
 class CmdIFCONFIG(MprShellCmd):
 
     def __init__(self, cmd_username):
@@ -353,34 +1543,42 @@ class CmdRM(MprShellCmd):
         self.username = cmd_username
         self.ALL_CMDS.append(self.name)
 
-    def cmd_run(self, cargs=None):
-        if len(cargs) == 0:
-            return True
-
-        file_info = self.stat_file(cargs[0])
+    def _rm_path(self, rm_path):
+        file_info = self.stat_file(rm_path)
         if not file_info['exists']:
             self.output.append(file_info['error'])
             return False
 
         elif file_info['is_dir']:
             try:
-                os.rmdir(cargs[0])
+                os.rmdir(rm_path)
                 return True
             except OSError:
-                self.output.append('Couldnt remove directory: {0}'.format(cargs[0]))
+                self.output.append('Couldnt remove directory: {0}'.format(rm_path))
                 return False
 
         elif file_info['is_file']:
             try:
-                os.remove(cargs[0])
+                os.remove(rm_path)
                 return True
             except OSError:
-                self.output.append('Couldnt remove file: {0}'.format(cargs[0]))
+                self.output.append('Couldnt remove file: {0}'.format(rm_path))
                 return False
             # print('Not a directory:', directory[0])
 
         return False
 
+    def cmd_run(self, cargs=None):
+        if len(cargs) == 0:
+            return True
+
+        rm_retval = True
+        for rm_path in cargs:
+            if not self._rm_path(rm_path):
+                rm_retval = False
+
+        return rm_retval
+
 
 class CmdMKDIR(MprShellCmd):
 
@@ -479,7 +1677,7 @@ class CmdLS(MprShellCmd):
         self.help = 'lists files on disk'
         self.username = cmd_username
         self.ALL_CMDS.append(self.name)
-        self.flags['l'] = False
+        self.flag_spec = 'l'
 
     def ll_dir(self, ls_dir):
         ll_output = []
@@ -495,7 +1693,6 @@ class CmdLS(MprShellCmd):
         return ll_output
 
     def cmd_run(self, cargs=None):
-        self.flags['l'] = False
         ls_list = []
 
         if not self.find_flags(self.flags, cargs):
@@ -619,6 +1816,286 @@ class CmdPASSWD(MprShellCmd):
         self.output.append('Setting password for {0} to {1}'.format(self.username, cmd_input_args))
 
 
+class MprScheduler:
+
+    def __init__(self, shell):
+        self.shell = shell
+        self.jobs = {}
+        # Heap of (due ms, job id), a single thread works through it for every job
+        self.heap = []
+        self.next_id = 1
+        self.running = False
+        self.lock = ompsh_thread.allocate_lock()
+        # Ticks wrap on micropython, so keep our own non-wrapping clock for the heap
+        self.now = 0
+        self.last_ticks = ticks_ms()
+
+    def _advance(self):
+        cur_ticks = ticks_ms()
+        self.now += ticks_diff(cur_ticks, self.last_ticks)
+        self.last_ticks = cur_ticks
+
+    def add_job(self, job_cmd, period_ms, output_file=None, to_console=False, max_lines=SCHED_MAX_LINES,
+                job_name='every'):
+        job_cwd = os.getcwd()
+        # The output file is written after the user's cwd is restored, so pin it to the job's cwd
+        if output_file is not None and not output_file.startswith('/'):
+            output_file = job_cwd.rstrip('/') + '/' + output_file
+
+        with self.lock:
+            self._advance()
+            job = {'id': self.next_id,
+                   'name': job_name,
+                   'cmd': job_cmd,
+                   'cwd': job_cwd,
+                   'period': period_ms,
+                   'due': self.now + period_ms,
+                   'runs': 0,
+                   'skipped': 0,
+                   'late_ms': 0,
+                   'max_late_ms': 0,
+                   'output_file': output_file,
+                   'to_console': to_console,
+                   'max_lines': max_lines,
+                   'ring': [None] * SCHED_RING_LINES,
+                   'ring_pos': 0,
+                   'ring_count': 0
+                   }
+            self.jobs[job['id']] = job
+            ompsh_heapq.heappush(self.heap, (job['due'], job['id']))
+            self.next_id += 1
+
+            # The thread exits once it finds no jobs left, so start one again if needed
+            start_thread = not self.running
+            self.running = True
+
+        if start_thread:
+            ompsh_thread.start_new_thread(self._run_forever, ())
+
+        return job
+
+    def cancel_job(self, job_id):
+        # Cancelled jobs are dropped from the heap when they next come due
+        with self.lock:
+            return self.jobs.pop(job_id, None) is not None
+
+    def cancel_all(self):
+        with self.lock:
+            self.jobs.clear()
+
+    def ring_lines(self, job):
+        ring_start = job['ring_pos'] - job['ring_count']
+        return [job['ring'][(ring_start + x) % SCHED_RING_LINES] for x in range(job['ring_count'])]
+
+    def _ring_add(self, job, line):
+        job['ring'][job['ring_pos']] = line
+        job['ring_pos'] = (job['ring_pos'] + 1) % SCHED_RING_LINES
+        job['ring_count'] = min(job['ring_count'] + 1, SCHED_RING_LINES)
+
+    def _output(self, job, job_output):
+        lines = ['[job {0} run {1}] {2}'.format(job['id'], job['runs'], job['cmd'])]
+        for oline in job_output:
+            lines.extend(str(oline).splitlines())
+
+        if len(lines) > job['max_lines'] + 1:
+            dropped = len(lines) - job['max_lines'] - 1
+            lines = lines[:job['max_lines'] + 1]
+            lines.append('... {0} more lines'.format(dropped))
+
+        if job['to_console']:
+            for oline in lines:
+                print(oline)
+
+        if job['output_file'] is not None:
+            try:
+                with open(job['output_file'], 'a') as f:
+                    for oline in lines:
+                        f.write(oline + '\n')
+            except OSError as e:
+                lines.append('Couldnt write to {0}: {1}'.format(job['output_file'], e))
+
+        # The ring always keeps the latest output, so jobs ID can show it whatever the target
+        for oline in lines:
+            self._ring_add(job, oline)
+
+    def _run_job(self, job):
+        job['runs'] += 1
+        try:
+            job_output = self.shell.run_job(job['cmd'], job['cwd'])
+        except Exception as e:
+            job_output = ['Error running job: {0}'.format(e)]
+
+        self._output(job, job_output)
+
+    def _reschedule(self, job):
+        # Schedule from the previous due time so lateness doesnt accumulate,
+        # runs that were missed entirely are skipped rather than bunched up
+        job['due'] += job['period']
+        if job['due'] < self.now:
+            missed = (self.now - job['due'] + job['period'] - 1) // job['period']
+            job['skipped'] += missed
+            job['due'] += missed * job['period']
+
+    def _run_forever(self):
+        while self.running:
+            due_jobs = []
+            with self.lock:
+                self._advance()
+                while len(self.heap) > 0 and self.heap[0][0] <= self.now:
+                    _, job_id = ompsh_heapq.heappop(self.heap)
+                    if job_id in self.jobs:
+                        due_jobs.append(self.jobs[job_id])
+
+            for job in due_jobs:
+                job['late_ms'] = self.now - job['due']
+                job['max_late_ms'] = max(job['max_late_ms'], job['late_ms'])
+                self._run_job(job)
+
+            with self.lock:
+                self._advance()
+                for job in due_jobs:
+                    if job['id'] not in self.jobs:
+                        continue
+
+                    self._reschedule(job)
+                    ompsh_heapq.heappush(self.heap, (job['due'], job['id']))
+
+                if len(self.jobs) == 0:
+                    self.heap = []
+                    self.running = False
+                    break
+
+                sleep_for = SCHED_TICK_MS
+                if len(self.heap) > 0:
+                    sleep_for = max(0, min(sleep_for, self.heap[0][0] - self.now))
+
+            gc.collect()
+            sleep_ms(sleep_for)
+
+
+class CmdEVERY(MprShellCmd):
+
+    def __init__(self, cmd_username, scheduler, watch=False):
+        super().__init__()
+        self.name = 'watch' if watch else 'every'
+        self.help = '{0} [-o file] [-n lines] SECONDS CMD - runs CMD periodically{1}'.format(
+            self.name, ', printing its output' if watch else '')
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.flag_spec = 'o:n:'
+        self.flags_before_args = True
+        self.scheduler = scheduler
+        self.watch = watch
+
+    def cmd_run(self, cargs=None):
+        if not self.find_flags(self.flags, cargs):
+            self.output.append(self.flags['error'])
+            return False
+
+        if self.scheduler is None:
+            self.output.append('Scheduler needs _thread support')
+            return False
+
+        if len(cargs) < 2:
+            self.output.append('Usage: {0}'.format(self.help))
+            return False
+
+        try:
+            period_ms = int(float(cargs[0]) * 1000)
+            max_lines = SCHED_MAX_LINES if self.flags['n'] is None else int(self.flags['n'])
+        except (ValueError, OverflowError):
+            self.output.append('Invalid number: {0}'.format(cargs[0] if self.flags['n'] is None else self.flags['n']))
+            return False
+
+        if period_ms <= 0:
+            self.output.append('Period must be positive: {0}'.format(cargs[0]))
+            return False
+
+        # A single quoted arg is kept as is, so wildcards in it are expanded on every run
+        if len(cargs) == 2:
+            job_cmd = cargs[1]
+        else:
+            job_cmd = ' '.join(quote_arg(x) for x in cargs[1:])
+
+        job = self.scheduler.add_job(job_cmd, period_ms, output_file=self.flags['o'], to_console=self.watch,
+                                     max_lines=max_lines, job_name=self.name)
+        self.output.append('Job {0}: {1} {2}s {3}'.format(job['id'], self.name, cargs[0], job_cmd))
+        return True
+
+
+class CmdJOBS(MprShellCmd):
+
+    def __init__(self, cmd_username, scheduler):
+        super().__init__()
+        self.name = 'jobs'
+        self.help = 'lists scheduled jobs, or the recent output of one: jobs [ID]'
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.scheduler = scheduler
+
+    def cmd_run(self, cargs=None):
+        if self.scheduler is None:
+            self.output.append('Scheduler needs _thread support')
+            return False
+
+        if len(cargs) == 0:
+            for job in list(self.scheduler.jobs.values()):
+                self.output.append('{0}\t{1} {2}s\truns={3} skipped={4} late={5}ms max_late={6}ms\t{7}'.format(
+                    job['id'], job['name'], job['period'] / 1000.0, job['runs'], job['skipped'], job['late_ms'],
+                    job['max_late_ms'], job['cmd']))
+            return True
+
+        try:
+            job = self.scheduler.jobs.get(int(cargs[0]))
+        except ValueError:
+            job = None
+
+        if job is None:
+            self.output.append('No such job: {0}'.format(cargs[0]))
+            return False
+
+        [self.output.append(x) for x in self.scheduler.ring_lines(job)]
+        return True
+
+
+class CmdCANCEL(MprShellCmd):
+
+    def __init__(self, cmd_username, scheduler):
+        super().__init__()
+        self.name = 'cancel'
+        self.help = 'cancels scheduled jobs: cancel ID|all'
+        self.username = cmd_username
+        self.ALL_CMDS.append(self.name)
+        self.scheduler = scheduler
+
+    def cmd_run(self, cargs=None):
+        if self.scheduler is None:
+            self.output.append('Scheduler needs _thread support')
+            return False
+
+        if len(cargs) == 0:
+            self.output.append('Please specify a job id')
+            return False
+
+        if cargs[0] == 'all':
+            self.scheduler.cancel_all()
+            return True
+        else:
+            try:
+                job_ids = [int(x) for x in cargs]
+            except ValueError:
+                self.output.append('Invalid job id: {0}'.format(' '.join(cargs)))
+                return False
+
+        cancel_retval = True
+        for job_id in job_ids:
+            if not self.scheduler.cancel_job(job_id):
+                self.output.append('No such job: {0}'.format(job_id))
+                cancel_retval = False
+
+        return cancel_retval
+
+
 class MprShell:
 
     cmds = {}
@@ -635,6 +2112,42 @@ class MprShell:
         self.input_cmd = ''
         self.input_prompt = ''
         self.shell_env = {}
+        self.dir_cache = {}
+        # Held while a command runs, so scheduled jobs dont run alongside interactive ones
+        self.cmd_lock = ompsh_thread.allocate_lock() if HAVE_THREAD else None
+        self.scheduler = MprScheduler(self) if HAVE_THREAD else None
+
+    def add_cmd(self, name, cmd):
+        """
+        Registers a shell command, compiling its flag spec once up front
+        :param name: the name the command is invoked by
+        :param cmd: the MprShellCmd instance
+        """
+
+        cmd.compile_flags()
+        self.cmds[name] = cmd
+
+    def parse_cmdline(self, scmd):
+        """
+        Tokenizes a command line and expands wildcards. Directory listings are cached
+        in self.dir_cache so several patterns on one line only list a directory once
+        :param scmd: the command line string
+        :return: list of args, the command name first
+        """
+
+        scmd_args = []
+        for word, pattern in split_cmdline(scmd):
+            if pattern is None:
+                scmd_args.append(word)
+                continue
+
+            matches = expand_glob(pattern, self.dir_cache)
+            if len(matches) > 0:
+                scmd_args.extend(matches)
+            else:
+                scmd_args.append(word)
+
+        return scmd_args
 
     def start_shell(self, username='noone', prompt='mprsh#'):
         self.started = True
@@ -645,25 +2158,87 @@ class MprShell:
         self.shell_env['cwd'] = os.getcwd()
         self.shell_env['prompt'] = self.prompt
 
-        self.cmds['whoami'] = CmdWHOAMI(cmd_username=self.username)
-        self.cmds['ls'] = CmdLS(cmd_username=self.username)
-        self.cmds['pwd'] = CmdPWD(cmd_username=self.username)
-        self.cmds['cd'] = CmdCD(cmd_username=self.username)
-        self.cmds['uname'] = CmdUNAME(cmd_username=self.username)
-        self.cmds['rm'] = CmdRM(cmd_username=self.username)
-        self.cmds['rmdir'] = CmdRM(cmd_username=self.username)
-        self.cmds['mkdir'] = CmdMKDIR(cmd_username=self.username)
-        self.cmds['wget'] = CmdWGET(cmd_username=self.username)
-        self.cmds['passwd'] = CmdPASSWD(cmd_username=self.username)
-        self.cmds['cat'] = CmdCAT(cmd_username=self.username)
-        self.cmds['ifconfig'] = CmdIFCONFIG(cmd_username=self.username)
-        self.cmds['meminfo'] = CmdMEMINFO(cmd_username=self.username)
-        self.cmds['df'] = CmdDF(cmd_username=self.username)
+        self.add_cmd('whoami', CmdWHOAMI(cmd_username=self.username))
+        self.add_cmd('ls', CmdLS(cmd_username=self.username))
+        self.add_cmd('pwd', CmdPWD(cmd_username=self.username))
+        self.add_cmd('cd', CmdCD(cmd_username=self.username))
+        self.add_cmd('uname', CmdUNAME(cmd_username=self.username))
+        self.add_cmd('rm', CmdRM(cmd_username=self.username))
+        self.add_cmd('rmdir', CmdRM(cmd_username=self.username))
+        self.add_cmd('mkdir', CmdMKDIR(cmd_username=self.username))
+        self.add_cmd('wget', CmdWGET(cmd_username=self.username))
+        self.add_cmd('httpd', CmdHTTPD(cmd_username=self.username))
+        self.add_cmd('sync', CmdSYNC(cmd_username=self.username))
+        self.add_cmd('gzip', CmdGZIP(cmd_username=self.username))
+        self.add_cmd('gunzip', CmdGZIP(cmd_username=self.username, decompress=True))
+        self.add_cmd('every', CmdEVERY(cmd_username=self.username, scheduler=self.scheduler))
+        self.add_cmd('watch', CmdEVERY(cmd_username=self.username, scheduler=self.scheduler, watch=True))
+        self.add_cmd('jobs', CmdJOBS(cmd_username=self.username, scheduler=self.scheduler))
+        self.add_cmd('cancel', CmdCANCEL(cmd_username=self.username, scheduler=self.scheduler))
+        self.add_cmd('passwd', CmdPASSWD(cmd_username=self.username))
+        self.add_cmd('cat', CmdCAT(cmd_username=self.username))
+        self.add_cmd('ifconfig', CmdIFCONFIG(cmd_username=self.username))
+        self.add_cmd('meminfo', CmdMEMINFO(cmd_username=self.username))
+        self.add_cmd('df', CmdDF(cmd_username=self.username))
+
+    def run_job(self, scmd, job_cwd):
+        """
+        Runs a command line for a scheduled job in the directory it was scheduled from,
+        putting back the interactive cwd afterwards
+        :param scmd: the command line string
+        :param job_cwd: the directory to run the command in
+        :return: list of output lines
+        """
+
+        with self.cmd_lock:
+            user_cwd = os.getcwd()
+            try:
+                os.chdir(job_cwd)
+            except OSError:
+                return ['Couldnt change directory: {0}'.format(job_cwd)]
+
+            try:
+                return self._run_job(scmd)
+            finally:
+                os.chdir(user_cwd)
+
+    def _run_job(self, scmd):
+        self.dir_cache.clear()
+        try:
+            job_args = self.parse_cmdline(scmd)
+        except ValueError as e:
+            return ['Syntax error: {0}'.format(e)]
+
+        if len(job_args) == 0:
+            return []
+
+        if job_args[0] not in self.cmds:
+            return ['Unknown command: {0}'.format(job_args[0])]
+
+        job_cmd = self.cmds[job_args[0]]
+        job_cmd.cmd_run(job_args[1:])
+        job_output = job_cmd.output.copy()
+        job_cmd.output.clear()
+
+        if job_cmd.waiting_input:
+            job_cmd.waiting_input = False
+            job_output.append('Commands needing input cant be scheduled')
+
+        return job_output
 
     def run_cmd(self, scmd):
+        if self.cmd_lock is None:
+            return self._run_cmd(scmd)
+
+        with self.cmd_lock:
+            return self._run_cmd(scmd)
+
+    def _run_cmd(self, scmd):
         # scmd_args = re.split(" +", scmd)
 
         self.cmd_output.clear()
+        # Commands may change the filesystem, so listings are only reused within one line
+        self.dir_cache.clear()
         if not self.started:
             self.start_shell()
 
@@ -675,6 +2250,8 @@ class MprShell:
         else:
             if scmd == 'exit':
                 self.started = False
+                if self.scheduler is not None:
+                    self.scheduler.cancel_all()
                 return False
 
             if scmd == 'help':
@@ -683,7 +2260,14 @@ class MprShell:
                 self.cmd_output.append('exit - exits shell')
                 return True
 
-            scmd_args = scmd.split()
+            try:
+                scmd_args = self.parse_cmdline(scmd)
+            except ValueError as e:
+                self.cmd_output.append('Syntax error: {0}'.format(e))
+                return True
+
+            if len(scmd_args) == 0:
+                return True
             # print('Received cmd:', scmd_args[0], ' with args:', scmd_args[1:])
 
         if self.need_input or scmd_args[0] in self.cmds:
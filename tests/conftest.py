@@ -0,0 +1,7 @@
+import os
+import sys
+import types
+
+# ompsh targets micropython, provide the one module it needs from it when run under CPython
+sys.modules.setdefault('micropython', types.SimpleNamespace(mem_info=lambda: None))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,123 @@
+import ompsh
+
+
+def test_split_quotes_and_escapes():
+    assert ompsh.split_cmdline('ls  -l\t"my dir" \'a b\' c\\ d') == [
+        ('ls', None), ('-l', None), ('my dir', None), ('a b', None), ('c d', None)]
+    assert ompsh.split_cmdline('echo "say \\"hi\\"" \'\\x\'') == [('echo', None), ('say "hi"', None), ('\\x', None)]
+    assert ompsh.split_cmdline('a "" b') == [('a', None), ('', None), ('b', None)]
+
+
+def test_split_glob_patterns():
+    # Only unquoted wildcards make a pattern, quoted ones are escaped in it
+    assert ompsh.split_cmdline('rm *.log "*".txt \\*x') == [
+        ('rm', None), ('*.log', '*.log'), ('*.txt', None), ('*x', None)]
+    assert ompsh.split_cmdline('rm "my dir"/*.log') == [('rm', None), ('my dir/*.log', 'my dir/*.log')]
+    assert ompsh.split_cmdline('ls "a*"?') == [('ls', None), ('a*?', 'a\\*?')]
+
+
+def test_split_unterminated_quote():
+    try:
+        ompsh.split_cmdline('cat "oops')
+    except ValueError as e:
+        assert 'Unterminated quote' in str(e)
+    else:
+        assert False
+
+
+def test_glob_match():
+    def match(pattern, name):
+        return ompsh.glob_match(ompsh.glob_compile(pattern), name)
+
+    assert match('*.log', 'a.log')
+    assert not match('*.log', 'a.log.1')
+    assert match('a*b*c', 'aXbYbc')
+    assert match('a?c', 'abc')
+    assert not match('a?c', 'ac')
+    assert match('*', '')
+    assert match('**x', 'abx')
+    assert match('a\\*', 'a*')
+    assert not match('a\\*', 'ab')
+
+
+def test_expand_glob(tmp_path, monkeypatch):
+    for name in ['a.log', 'b.log', '.hidden.log', 'c.txt']:
+        (tmp_path / name).write_text('')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'd.log').write_text('')
+    monkeypatch.chdir(tmp_path)
+
+    dir_cache = {}
+    assert ompsh.expand_glob('*.log', dir_cache) == ['a.log', 'b.log']
+    assert ompsh.expand_glob('.*.log', dir_cache) == ['.hidden.log']
+    assert ompsh.expand_glob('sub/*.log', dir_cache) == ['sub/d.log']
+    assert ompsh.expand_glob('{0}/*.txt'.format(tmp_path), dir_cache) == ['{0}/c.txt'.format(tmp_path)]
+    assert ompsh.expand_glob('nope/*', dir_cache) == []
+    assert sorted(dir_cache) == sorted(['.', 'nope', str(tmp_path), 'sub'])
+
+    # Later patterns reuse the cached listing rather than listing the directory again
+    dir_cache['.'] = ['z.log']
+    assert ompsh.expand_glob('*.log', dir_cache) == ['z.log']
+
+
+def test_parse_cmdline(tmp_path, monkeypatch):
+    for name in ['a.log', 'b.log']:
+        (tmp_path / name).write_text('')
+    monkeypatch.chdir(tmp_path)
+
+    shell = ompsh.MprShell()
+    assert shell.parse_cmdline('rm *.log "*.log" *.txt') == ['rm', 'a.log', 'b.log', '*.log', '*.txt']
+
+
+def make_cmd(flag_spec):
+    cmd = ompsh.MprShellCmd()
+    cmd.flag_spec = flag_spec
+    cmd.compile_flags()
+    return cmd
+
+
+def test_find_flags():
+    cmd = make_cmd('lan:')
+    assert cmd.flag_table == {'l': False, 'a': False, 'n': True}
+
+    cargs = ['-la', 'x', '-n5', 'y']
+    assert cmd.find_flags(cmd.flags, cargs)
+    assert cargs == ['x', 'y']
+    assert cmd.flags['l'] is True and cmd.flags['a'] is True and cmd.flags['n'] == '5'
+
+    cargs = ['-n', '7', '--', '-l', '-']
+    assert cmd.find_flags(cmd.flags, cargs)
+    assert cargs == ['-l', '-']
+    assert cmd.flags['n'] == '7' and cmd.flags['l'] is False
+
+
+def test_find_flags_errors():
+    cmd = make_cmd('ln:')
+    assert not cmd.find_flags(cmd.flags, ['-lz'])
+    assert cmd.flags['error'] == 'Invalid flag: z'
+    assert not cmd.find_flags(cmd.flags, ['-n'])
+    assert cmd.flags['error'] == 'Flag requires a value: n'
+
+
+def test_find_flags_before_args():
+    cmd = make_cmd('o:')
+    cmd.flags_before_args = True
+    cargs = ['-o', 'f', '5', 'ls', '-l']
+    assert cmd.find_flags(cmd.flags, cargs)
+    assert cargs == ['5', 'ls', '-l']
+    assert cmd.flags['o'] == 'f'
+
+
+def test_shell_rm_glob(tmp_path, monkeypatch):
+    for name in ['a.log', 'b.log', 'keep.txt']:
+        (tmp_path / name).write_text('')
+    monkeypatch.chdir(tmp_path)
+
+    shell = ompsh.MprShell()
+    shell.start_shell()
+    shell.run_cmd('rm *.log')
+    assert sorted(x.name for x in tmp_path.iterdir()) == ['keep.txt']
+    shell.run_cmd('ls -l -z')
+    assert shell.cmd_output == ['Invalid flag: z']
+    shell.run_cmd('cat "unterminated')
+    assert shell.cmd_output == ['Syntax error: Unterminated quote: "']
@@ -0,0 +1,123 @@
+import binascii
+import gzip
+import io
+import socket
+import threading
+import zlib
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import ompsh
+
+DATA = b''.join(b'line %d of some compressible text\n' % x for x in range(2000))
+
+
+def read_all(stream, size=100):
+    buf = bytearray(size)
+    out = b''
+    while True:
+        nread = stream.readinto(buf)
+        if not nread:
+            return out
+        assert nread <= size
+        out += bytes(buf[:nread])
+
+
+def test_zlib_reader_gzip_and_zlib():
+    assert read_all(ompsh.ZlibReader(io.BytesIO(gzip.compress(DATA)), 15 + 16)) == DATA
+    assert read_all(ompsh.ZlibReader(io.BytesIO(zlib.compress(DATA)), 15)) == DATA
+
+
+def test_zlib_reader_corrupt():
+    with pytest.raises(OSError):
+        read_all(ompsh.ZlibReader(io.BytesIO(b'not compressed at all'), 15 + 16))
+
+    # A stream cut short is an error, not a silently short file
+    with pytest.raises(OSError):
+        read_all(ompsh.ZlibReader(io.BytesIO(gzip.compress(DATA)[:200]), 15 + 16))
+
+
+def test_inflate_stream():
+    assert read_all(ompsh.inflate_stream(io.BytesIO(gzip.compress(DATA)), True)) == DATA
+    assert read_all(ompsh.inflate_stream(io.BytesIO(zlib.compress(DATA)), False)) == DATA
+
+
+def test_http_body_stream_prefix():
+    a, b = socket.socketpair()
+    a.sendall(b'world')
+    a.close()
+    assert read_all(ompsh.HttpBodyStream(b, b'hello '), 4) == b'hello world'
+    b.close()
+
+
+def test_gzip_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data.txt').write_bytes(DATA)
+    shell = ompsh.MprShell()
+    shell.start_shell()
+
+    shell.run_cmd('gzip -k data.txt')
+    assert shell.cmd_output == []
+    assert gzip.decompress((tmp_path / 'data.txt.gz').read_bytes()) == DATA
+    assert (tmp_path / 'data.txt').exists()
+
+    shell.run_cmd('gunzip data.txt.gz')
+    assert shell.cmd_output == ['Already exists: data.txt']
+
+    (tmp_path / 'data.txt').unlink()
+    shell.run_cmd('gunzip data.txt.gz')
+    assert (tmp_path / 'data.txt').read_bytes() == DATA
+    assert not (tmp_path / 'data.txt.gz').exists()
+
+    shell.run_cmd('gzip -d data.txt')
+    assert shell.cmd_output == ['Unknown suffix, ignored: data.txt']
+
+
+def test_gunzip_corrupt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'bad.gz').write_bytes(b'not gzip data')
+    shell = ompsh.MprShell()
+    shell.start_shell()
+
+    shell.run_cmd('gunzip bad.gz')
+    assert shell.cmd_output[0].startswith('Couldnt gunzip bad.gz: ')
+    assert not (tmp_path / 'bad').exists()
+    assert (tmp_path / 'bad.gz').exists()
+
+    shell.run_cmd('gunzip missing.gz')
+    assert shell.cmd_output == ['No such file or directory: missing.gz']
+
+
+class EncodingHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.accept_encoding = self.headers.get('Accept-Encoding')
+        encoding = self.path.strip('/')
+        body = {'gzip': gzip.compress, 'deflate': zlib.compress}.get(encoding, bytes)(DATA)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        if encoding != 'identity':
+            # Lower case on purpose, header names are case insensitive
+            self.send_header('content-encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'identity'])
+def test_http_get_decodes(tmp_path, monkeypatch, encoding):
+    monkeypatch.setattr(ompsh, 'ompsh_socket', socket, raising=False)
+    monkeypatch.setattr(ompsh, 'ompsh_binascii', binascii, raising=False)
+    httpd = HTTPServer(('127.0.0.1', 0), EncodingHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        out = tmp_path / 'out'
+        retval, hdr = ompsh.http_get('http://127.0.0.1:{0}/{1}'.format(httpd.server_address[1], encoding), str(out))
+        assert retval, hdr
+        assert out.read_bytes() == DATA
+        assert httpd.accept_encoding == 'gzip, deflate'
+    finally:
+        httpd.shutdown()
@@ -0,0 +1,148 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import ompsh
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def http_request(port, req):
+    s = socket.create_connection(('127.0.0.1', port), timeout=5)
+    s.sendall(req)
+    resp = b''
+    while True:
+        data = s.recv(4096)
+        if not data:
+            break
+        resp += data
+    s.close()
+    header, _, body = resp.partition(b'\r\n\r\n')
+    return header.decode(), body
+
+
+@pytest.fixture
+def httpd(tmp_path):
+    (tmp_path / 'hello.txt').write_bytes(b'hello world\n')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a<b>.log').write_bytes(b'x')
+    server = ompsh.MprHttpd(root=str(tmp_path), port=free_port(), max_conns=2)
+    server.running = True
+    t = threading.Thread(target=server.serve_forever)
+    t.start()
+    # Wait for a complete response, so the probe isnt still holding a connection slot
+    for _ in range(50):
+        try:
+            http_request(server.port, b'HEAD / HTTP/1.0\r\n\r\n')
+            break
+        except OSError:
+            time.sleep(0.05)
+    yield server
+    server.running = False
+    t.join(5)
+
+
+def test_get_file(httpd):
+    header, body = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\n\r\n')
+    assert header.startswith('HTTP/1.0 200')
+    assert 'Content-Length: 12' in header
+    assert body == b'hello world\n'
+
+
+def test_head(httpd):
+    header, body = http_request(httpd.port, b'HEAD /hello.txt HTTP/1.0\r\n\r\n')
+    assert header.startswith('HTTP/1.0 200')
+    assert 'Content-Length: 12' in header
+    assert body == b''
+
+
+def test_range(httpd):
+    header, body = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\nRange: bytes=6-\r\n\r\n')
+    assert header.startswith('HTTP/1.0 206')
+    assert 'Content-Range: bytes 6-11/12' in header
+    assert body == b'world\n'
+
+    header, body = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\nrange: bytes=-3\r\n\r\n')
+    assert header.startswith('HTTP/1.0 206')
+    assert body == b'ld\n'
+
+
+def test_range_not_satisfiable(httpd):
+    header, _ = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\nRange: bytes=100-\r\n\r\n')
+    assert header.startswith('HTTP/1.0 416')
+    assert 'Content-Range: bytes */12' in header
+
+
+def test_dir_listing(httpd):
+    header, body = http_request(httpd.port, b'GET /sub HTTP/1.0\r\n\r\n')
+    assert header.startswith('HTTP/1.0 200')
+    assert b'<a href="/sub/a%3Cb%3E.log">a&lt;b&gt;.log</a>' in body
+    assert b'<a href="/">..</a>' in body
+
+
+def test_bad_requests(httpd):
+    assert http_request(httpd.port, b'GET /../etc/passwd HTTP/1.0\r\n\r\n')[0].startswith('HTTP/1.0 403')
+    assert http_request(httpd.port, b'GET /nope HTTP/1.0\r\n\r\n')[0].startswith('HTTP/1.0 404')
+    assert http_request(httpd.port, b'GET /%ff HTTP/1.0\r\n\r\n')[0].startswith('HTTP/1.0 400')
+    assert http_request(httpd.port, b'PUT /hello.txt HTTP/1.0\r\n\r\n')[0].startswith('HTTP/1.0 405')
+
+
+def test_connection_cap(httpd):
+    # Idle connections hold their slot while the server waits for the request line
+    idle = [socket.create_connection(('127.0.0.1', httpd.port)) for _ in range(httpd.max_conns)]
+    time.sleep(0.2)
+    header, _ = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\n\r\n')
+    assert header.startswith('HTTP/1.0 503')
+    [x.close() for x in idle]
+    time.sleep(0.2)
+    header, _ = http_request(httpd.port, b'GET /hello.txt HTTP/1.0\r\n\r\n')
+    assert header.startswith('HTTP/1.0 200')
+
+
+def test_url_quote_non_ascii():
+    assert ompsh.url_quote('/dòc a²') == '/d%C3%B2c%20a%C2%B2'
+    assert ompsh.url_unquote(ompsh.url_quote('/dòc a²')) == '/dòc a²'
+
+
+def test_httpd_cmd(tmp_path, monkeypatch):
+    (tmp_path / 'logs').mkdir()
+    (tmp_path / 'logs' / 'x.txt').write_bytes(b'x')
+    (tmp_path / 'other').mkdir()
+    monkeypatch.chdir(tmp_path)
+    port = free_port()
+    shell = ompsh.MprShell()
+    shell.start_shell()
+
+    shell.run_cmd('httpd start -p 99999')
+    assert shell.cmd_output == ['Invalid port: 99999']
+
+    shell.run_cmd('httpd start -p {0} -d logs'.format(port))
+    assert shell.cmd_output == ['httpd serving {0}/logs on port {1}'.format(tmp_path, port)]
+    try:
+        # The root was made absolute at start, so a cd doesnt move it
+        shell.run_cmd('cd other')
+        for _ in range(50):
+            try:
+                header, body = http_request(port, b'GET /x.txt HTTP/1.0\r\n\r\n')
+                break
+            except OSError:
+                time.sleep(0.05)
+        assert header.startswith('HTTP/1.0 200') and body == b'x'
+
+        # Restarting straight after a stop waits for the old server to release the port
+        shell.run_cmd('httpd stop')
+        shell.run_cmd('httpd start -p {0} -d {1}'.format(port, tmp_path))
+        time.sleep(0.3)
+        shell.run_cmd('httpd status')
+        assert shell.cmd_output[0].startswith('running=True')
+        assert http_request(port, b'GET /logs/x.txt HTTP/1.0\r\n\r\n')[1] == b'x'
+    finally:
+        shell.run_cmd('httpd stop')
@@ -0,0 +1,86 @@
+import time
+
+import ompsh
+
+
+def make_job(period, due):
+    return {'id': 1, 'period': period, 'due': due, 'skipped': 0}
+
+
+def test_reschedule_on_time():
+    sched = ompsh.MprScheduler(None)
+    job = make_job(1000, 5000)
+    # Ran a little late, the next run is still measured from the due time
+    sched.now = 5040
+    sched._reschedule(job)
+    assert job['due'] == 6000 and job['skipped'] == 0
+
+
+def test_reschedule_exactly_due_isnt_skipped():
+    sched = ompsh.MprScheduler(None)
+    job = make_job(1000, 5000)
+    sched.now = 6000
+    sched._reschedule(job)
+    assert job['due'] == 6000 and job['skipped'] == 0
+
+
+def test_reschedule_skips_missed_runs():
+    sched = ompsh.MprScheduler(None)
+    job = make_job(1000, 5000)
+    sched.now = 8500
+    sched._reschedule(job)
+    assert job['due'] == 9000 and job['skipped'] == 3
+
+
+def test_ring_buffer_keeps_latest():
+    sched = ompsh.MprScheduler(None)
+    job = {'ring': [None] * ompsh.SCHED_RING_LINES, 'ring_pos': 0, 'ring_count': 0}
+    for x in range(ompsh.SCHED_RING_LINES + 5):
+        sched._ring_add(job, x)
+    assert sched.ring_lines(job) == list(range(5, ompsh.SCHED_RING_LINES + 5))
+
+
+def wait_for(cond, timeout=3.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_every_jobs_cancel(tmp_path, monkeypatch):
+    (tmp_path / 'other').mkdir()
+    monkeypatch.chdir(tmp_path)
+    shell = ompsh.MprShell()
+    shell.start_shell()
+
+    shell.run_cmd('every -o out.txt -n 1 0.1 pwd')
+    assert shell.cmd_output == ['Job 1: every 0.1s pwd']
+    shell.run_cmd('watch 10 uname')
+    assert shell.cmd_output == ['Job 2: watch 10s uname']
+    shell.run_cmd('every inf df')
+    assert shell.cmd_output == ['Invalid number: inf']
+
+    # Jobs run, and write output, relative to where they were scheduled
+    shell.run_cmd('cd other')
+    assert wait_for(lambda: shell.scheduler.jobs[1]['runs'] >= 2)
+    assert not (tmp_path / 'other' / 'out.txt').exists()
+    assert (tmp_path / 'out.txt').read_text().splitlines()[:2] == ['[job 1 run 1] pwd', str(tmp_path)]
+
+    shell.run_cmd('jobs')
+    assert shell.cmd_output[0].startswith('1\tevery 0.1s\t')
+    assert shell.cmd_output[1].startswith('2\twatch 10.0s\t')
+    shell.run_cmd('jobs 1')
+    assert shell.cmd_output[:2] == ['[job 1 run 1] pwd', str(tmp_path)]
+
+    shell.run_cmd('cancel 1')
+    assert shell.cmd_output == []
+    shell.run_cmd('cancel 1')
+    assert shell.cmd_output == ['No such job: 1']
+    assert list(shell.scheduler.jobs) == [2]
+
+    # With no jobs left the scheduler thread exits
+    shell.run_cmd('cancel all')
+    assert shell.scheduler.jobs == {}
+    assert wait_for(lambda: not shell.scheduler.running)
@@ -0,0 +1,103 @@
+import binascii
+import functools
+import hashlib
+import socket
+import threading
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+import ompsh
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+def write_manifest(pub, names):
+    with open(pub / 'manifest', 'w') as f:
+        for name in names:
+            data = (pub / name).read_bytes()
+            f.write('{0} {1} {2}\n'.format(hashlib.sha256(data).hexdigest(), len(data), name))
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(ompsh, 'ompsh_socket', socket, raising=False)
+    monkeypatch.setattr(ompsh, 'ompsh_binascii', binascii, raising=False)
+    monkeypatch.setattr(ompsh, 'net_ioctl', lambda x: True)
+
+    pub = tmp_path / 'pub'
+    (pub / 'lib').mkdir(parents=True)
+    (pub / 'a.txt').write_bytes(b'one\n')
+    (pub / 'lib' / 'b c.py').write_bytes(b'two\n')
+    (pub / 'dòc.bin').write_bytes(bytes(range(256)) * 8)
+    write_manifest(pub, ['a.txt', 'lib/b c.py', 'dòc.bin'])
+
+    httpd = HTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(tmp_path)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield pub, 'http://127.0.0.1:{0}/pub/manifest'.format(httpd.server_address[1])
+    httpd.shutdown()
+
+
+def run_sync(args):
+    cmd = ompsh.CmdSYNC('test')
+    cmd.compile_flags()
+    retval = cmd.cmd_run(args)
+    return retval, cmd.output
+
+
+def test_sync_fetches_only_changes(server, tmp_path):
+    pub, url = server
+    dest = tmp_path / 'dev' / 'flash'
+
+    retval, output = run_sync(['-d', str(dest), url])
+    assert retval, output
+    assert output[-1] == '3 files, 3 changed, 0 failed, 2056 bytes fetched'
+    assert (dest / 'lib' / 'b c.py').read_bytes() == b'two\n'
+    assert (dest / 'dòc.bin').read_bytes() == (pub / 'dòc.bin').read_bytes()
+
+    retval, output = run_sync(['-d', str(dest), url])
+    assert output == ['3 files, 0 changed, 0 failed, 0 bytes fetched']
+
+    (dest / 'a.txt').write_bytes(b'local edit\n')
+    retval, output = run_sync(['-n', '-d', str(dest), url])
+    assert output == ['Would fetch: a.txt', '3 files, 1 changed, 0 failed, 0 bytes fetched']
+
+    retval, output = run_sync(['-d', str(dest), url])
+    assert output == ['Fetched: a.txt', '3 files, 1 changed, 0 failed, 4 bytes fetched']
+    assert (dest / 'a.txt').read_bytes() == b'one\n'
+    assert sorted(x.name for x in dest.iterdir()) == ['.ompsh_sync', 'a.txt', 'dòc.bin', 'lib']
+
+
+def test_sync_hash_mismatch(server, tmp_path):
+    pub, url = server
+    (pub / 'a.txt').write_bytes(b'ONE\n')
+    dest = tmp_path / 'dev'
+    dest.mkdir()
+
+    retval, output = run_sync(['-d', str(dest), url])
+    assert not retval
+    assert 'Hash mismatch: {0}/a.txt'.format(dest) in output
+    # The bad download is discarded rather than renamed into place
+    assert not (dest / 'a.txt').exists()
+    assert not (dest / 'a.txt.tmp').exists()
+
+
+def test_sync_bad_urls(server, tmp_path):
+    for url in ['manifest.txt', 'http://127.0.0.1:abc/manifest', 'http:///manifest']:
+        retval, output = run_sync(['-d', str(tmp_path), url])
+        assert output == ['Couldnt retrieve manifest: Invalid url: {0}'.format(url)]
+
+    retval, output = run_sync(['-d', str(tmp_path), 'http://127.0.0.1:1/manifest'])
+    assert not retval
+    assert output[0].startswith('Couldnt retrieve manifest: ')
+
+
+def test_sync_dir_is_file(server, tmp_path):
+    _, url = server
+    (tmp_path / 'afile').write_text('')
+    retval, output = run_sync(['-d', str(tmp_path / 'afile'), url])
+    assert output == ['Not a directory: {0}/'.format(tmp_path / 'afile')]